@@ -1,24 +1,51 @@
 
 import os
 import ast
-import json
+import bisect
 import subprocess
 import threading
 import time
 import shutil
+import tempfile
+import copy
+import functools
+import itertools
+import logging
 import re
+import queue
+import uuid
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from flask import Flask, render_template_string, jsonify, request, send_from_directory
-from flask_socketio import SocketIO, emit
+from flask import Flask, abort, jsonify, request, send_from_directory
+from flask_socketio import SocketIO, emit, join_room
+import orjson
+from socketio import packet as socketio_packet
+from socketio.base_manager import BaseManager as SocketIOBaseManager
 import tkinter as tk
 from tkinter import filedialog
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+class OrjsonCodec:
+    """json-module stand-in so Socket.IO packets are encoded and decoded with orjson"""
+    
+    @staticmethod
+    def dumps(obj, *args, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+    
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
-socketio = SocketIO(app, cors_allowed_origins="*")
+log = logging.getLogger(__name__)
+log.setLevel(logging.WARNING)  # Request-path chatter is debug level; errors still reach stderr
+socketio = SocketIO(app, cors_allowed_origins="*", json=OrjsonCodec)
 directory_data = {}
+directory_index = {}  # filename -> (nodes, edges) that make up directory_data, for per-file updates
+directory_data_lock = threading.Lock()  # Guards swapping in a new directory_data/directory_index
 initial_analysis = ""
 analysis_complete = False
 GEMINI_ENABLED = False  # Set to False to disable Gemini analysis
@@ -26,44 +53,244 @@ GEMINI_INITIALIZE_ON_STARTUP = False  # Whether to auto-initialize Gemini on sta
 GEMINI_INITIALIZED = False  # Whether Gemini has been initialized
 
 # Console logging system
-console_logs = deque(maxlen=1000)  # Keep last 1000 log entries
+console_logs = deque(maxlen=1000)  # Keep last 1000 log entries as (seq, timestamp, level, message) tuples
+console_log_seq = 0  # Sequence number of the latest entry, so clients can ask for what they missed
+CONSOLE_BOOT_ID = uuid.uuid4().hex  # Changes on restart, when sequence numbers start over
+# Entries waiting to be sent in the next batch; bounded like console_logs, since nothing drains it
+# until a client connects and new clients fetch the backlog from /console-output anyway
+pending_console_logs = deque(maxlen=console_logs.maxlen)
+console_logs_lock = threading.Lock()
+console_flusher_started = False
+CONSOLE_FLUSH_INTERVAL = 0.05  # Seconds between batched console emits
+CONSOLE_ROOM = 'console'  # Socket.IO room that receives console output
+STATIC_MAX_AGE = 300  # Seconds browsers may reuse styles.css before revalidating
+
+# Background analysis jobs
+analysis_queue = queue.Queue()
+analysis_jobs = {}  # job_id -> status dict served by /analysis/status/<job_id>
+analysis_jobs_lock = threading.Lock()
+analysis_worker_started = False
+ANALYSIS_PROGRESS_INTERVAL = 0.1  # Minimum seconds between analysis_progress emits for a job
+MAX_FINISHED_ANALYSIS_JOBS = 100  # Finished jobs kept around for status polling
 
 # File monitoring
 file_observer = None
+file_handler = None
 current_monitoring_directory = None
 
 def log_to_console(message, level="INFO"):
     """Add a message to the console log"""
+    global console_log_seq
     timestamp = datetime.now().strftime("%H:%M:%S")
-    log_entry = {
-        "timestamp": timestamp,
-        "level": level,
-        "message": message
-    }
-    console_logs.append(log_entry)
+    with console_logs_lock:
+        console_log_seq += 1
+        log_entry = {
+            "seq": console_log_seq,
+            "timestamp": timestamp,
+            "level": level,
+            "message": message
+        }
+        console_logs.append((console_log_seq, timestamp, level, message))
+        pending_console_logs.append(log_entry)  # Emitted to WebSocket clients by flush_console_logs
     print(f"[{level}] {message}")  # Also print to server console
+
+def flush_console_logs():
+    """Emit pending console entries to WebSocket clients in batches"""
+    while True:
+        socketio.sleep(CONSOLE_FLUSH_INTERVAL)
+        with console_logs_lock:
+            batch = list(pending_console_logs)
+            pending_console_logs.clear()
+        if batch:
+            emit_to_room('console_update_batch', batch, CONSOLE_ROOM)
+
+@socketio.on('connect')
+def handle_connect():
+    # Console output and file patches are sent to rooms, so only subscribed clients pay for them
+    join_room(CONSOLE_ROOM)
+    join_room(workspace_room(get_current_workspace()))
+    
+    # Start the console flusher once the first client is around to receive updates
+    global console_flusher_started
+    with console_logs_lock:
+        if console_flusher_started:
+            return
+        console_flusher_started = True
+    socketio.start_background_task(flush_console_logs)
+
+class _EncodedPacket:
+    """Socket.IO packet that is encoded up front and reused for every recipient"""
     
-    # Emit to WebSocket clients
-    socketio.emit('console_update', log_entry)
+    def __init__(self, pkt):
+        self.encoded = pkt.encode()
+    
+    def encode(self):
+        return self.encoded
+
+def emit_to_room(event, data, room):
+    """Emit an event to a room, serializing the payload once instead of once per client"""
+    server = socketio.server
+    # The fast path relies on python-socketio 5.8 internals (manager.rooms, get_participants and
+    # Server._send_packet) and on the in-process manager. Message-queue managers such as Redis
+    # must publish through emit, so anything else goes the regular way.
+    if type(server.manager) is not SocketIOBaseManager or not hasattr(server, '_send_packet'):
+        socketio.emit(event, data, to=room)
+        return
+    if '/' not in server.manager.rooms:
+        return  # Nobody has connected yet
+    pkt = _EncodedPacket(server.packet_class(socketio_packet.EVENT, namespace='/', data=[event, data]))
+    for _, eio_sid in server.manager.get_participants('/', room):
+        server._send_packet(eio_sid, pkt)
+
+def workspace_room(workspace_id):
+    """Socket.IO room for clients viewing the given workspace"""
+    return f"ws:{workspace_id}"
+
+def json_response(data):
+    """Build a JSON response with orjson, bypassing jsonify for large payloads"""
+    return app.response_class(orjson.dumps(data), mimetype='application/json')
+
+def get_json():
+    """Parse the request's JSON body with orjson, rejecting the request like request.json would"""
+    if not request.is_json:
+        abort(415)
+    try:
+        # cache=False: the raw body isn't kept on the request once parsed
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        abort(400)
+    if not isinstance(data, dict):
+        abort(400)  # Every endpoint expects an object of fields
+    return data
+
+_page_cache = {}  # path -> ((mtime_ns, size), html)
+
+def html_page(path):
+    """Serve a static HTML page, re-reading it only when it changed (the pages have no template syntax)"""
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _page_cache.get(path)
+    if not cached or cached[0] != stamp:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = (stamp, f.read())
+        _page_cache[path] = cached
+    return app.response_class(cached[1], mimetype='text/html')
+
+def get_directory_data_snapshot():
+    """Return the current directory_data for readers (must not be modified)"""
+    # Writers always publish a new dict instead of updating in place, so the reference is a snapshot
+    with directory_data_lock:
+        return directory_data if directory_data else {'nodes': [], 'edges': []}
+
+def _build_directory_index(data):
+    """Group a graph's nodes and edges by the file they belong to"""
+    index = {}
+    for node in data.get('nodes', []):
+        index.setdefault(node.get('file', node['id']), ([], []))[0].append(node)
+    for edge in data.get('edges', []):
+        index.setdefault(edge['source'], ([], []))[1].append(edge)
+    return index
+
+def _flatten_directory_index(index):
+    """Rebuild the flat nodes/edges graph from a per-file index"""
+    nodes = []
+    edges = []
+    for file_nodes, file_edges in index.values():
+        nodes.extend(file_nodes)
+        edges.extend(file_edges)
+    return {'nodes': nodes, 'edges': edges}
+
+def set_directory_data(data):
+    """Publish a newly analyzed graph together with its per-file index"""
+    global directory_data, directory_index
+    index = _build_directory_index(data)
+    with directory_data_lock:
+        directory_data = data
+        directory_index = index
+
+_project_context_cache = (None, "")  # (directory_data the text was built from, text)
+
+def get_project_context():
+    """Return every analyzed file's code as one block of text, rebuilt only after the graph changes"""
+    global _project_context_cache
+    # Every update publishes a new directory_data, so the published object itself identifies the version
+    data = get_directory_data_snapshot()
+    cached_data, text = _project_context_cache
+    if cached_data is not data:
+        text = ''.join(f"\n\n--- {node.get('name', 'unknown')} ---\n{node.get('code', '')}"
+                       for node in data['nodes'] if node.get('type') == 'file')
+        _project_context_cache = (data, text)
+    return text
 
 class CodeFileHandler(FileSystemEventHandler):
     """Handle file system events for Python files"""
     
+    DEBOUNCE_SECONDS = 0.25  # Quiet period before a burst of events for one file is re-analyzed
+    
+    def __init__(self):
+        super().__init__()
+        self._last_seen = {}  # path -> monotonic time of the latest event still waiting to be handled
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()  # Set once the workspace is no longer watched; nothing may be published after
+        self._worker = threading.Thread(target=self._process_changes, daemon=True)
+        self._worker.start()
+    
     def on_modified(self, event):
-        if event.is_directory:
+        if not event.is_directory:
+            self._queue_file(event.src_path)
+    
+    def on_moved(self, event):
+        # Atomic saves rename a temporary file over the original
+        if not event.is_directory:
+            self._queue_file(event.dest_path)
+    
+    def _queue_file(self, file_path):
+        """Queue a changed Python file for re-analysis"""
+        if not file_path.endswith('.py'):
             return
         
-        if event.src_path.endswith('.py'):
-            filename = os.path.basename(event.src_path)
-            log_to_console(f"File modified: {filename}", "INFO")
+        # Coalesce repeated events for the same file; only the first one queues it
+        with self._lock:
+            already_queued = file_path in self._last_seen
+            self._last_seen[file_path] = time.monotonic()
+        if not already_queued:
+            self._queue.put(file_path)
+    
+    def stop(self):
+        """Stop the re-analysis worker and wait until it can no longer publish updates"""
+        self._stopped.set()
+        self._queue.put(None)  # Wakes the worker if it is waiting for work
+        if threading.current_thread() is not self._worker:
+            self._worker.join()
+    
+    def _process_changes(self):
+        """Re-analyze queued files once their events have settled"""
+        while True:
+            file_path = self._queue.get()
+            if file_path is None or self._stopped.is_set():
+                return
+            
+            # Wait until no new event has arrived for this file within the debounce window
+            while True:
+                with self._lock:
+                    remaining = self._last_seen[file_path] + self.DEBOUNCE_SECONDS - time.monotonic()
+                    if remaining <= 0:
+                        del self._last_seen[file_path]
+                        break
+                time.sleep(remaining)
+            if self._stopped.is_set():
+                return
+            
+            log_to_console(f"File modified: {os.path.basename(file_path)}", "INFO")
             
             # Re-analyze the specific file
-            threading.Thread(target=self.reanalyze_file, args=(event.src_path,), daemon=True).start()
+            self.reanalyze_file(file_path)
     
     def reanalyze_file(self, file_path):
         """Re-analyze a single modified file"""
         try:
-            global directory_data
+            global directory_data, directory_index
             filename = os.path.basename(file_path)
             
             log_to_console(f"Re-analyzing {filename}...", "INFO")
@@ -74,25 +301,19 @@ class CodeFileHandler(FileSystemEventHandler):
             if not content:  # Skip if file couldn't be parsed
                 return
             
-            # Update directory_data
-            # Remove old nodes for this file
-            directory_data['nodes'] = [n for n in directory_data['nodes'] 
-                                     if not (n.get('file') == filename or n['id'] == filename)]
-            directory_data['edges'] = [e for e in directory_data['edges'] 
-                                     if e['source'] != filename]
-            
-            # Add updated file node
-            directory_data['nodes'].append({
+            # Build the replacement graph outside the lock (copy-on-write)
+            new_nodes = [{
                 "id": filename, 
                 "name": filename, 
                 "type": "file", 
                 "code": content
-            })
+            }]
+            new_edges = []
             
             # Add updated function and class nodes
             for func in functions:
                 func_id = f"{filename}::{func['name']}"
-                directory_data['nodes'].append({
+                new_nodes.append({
                     "id": func_id, 
                     "name": func['name'], 
                     "type": "function", 
@@ -101,42 +322,65 @@ class CodeFileHandler(FileSystemEventHandler):
                     "called_by": [],
                     "file": filename
                 })
-                directory_data['edges'].append({"source": filename, "target": func_id})
+                new_edges.append({"source": filename, "target": func_id})
             
             for cls in classes:
                 class_id = f"{filename}::{cls['name']}"
-                directory_data['nodes'].append({
+                new_nodes.append({
                     "id": class_id, 
                     "name": cls['name'], 
                     "type": "class", 
                     "code": cls['code'],
                     "file": filename
                 })
-                directory_data['edges'].append({"source": filename, "target": class_id})
+                new_edges.append({"source": filename, "target": class_id})
+            
+            while True:
+                with directory_data_lock:
+                    old_index = directory_index
+                
+                # Replace only this file's entry; the flat lists are rebuilt from the per-file groups
+                updated_index = dict(old_index)
+                updated_index[filename] = (new_nodes, new_edges)
+                updated_data = _flatten_directory_index(updated_index)
+                
+                # Publish with a single reference swap, retrying if another update landed meanwhile
+                with directory_data_lock:
+                    if self._stopped.is_set():
+                        return  # Monitoring stopped; the graph may already belong to another workspace
+                    if directory_index is old_index:
+                        directory_data = updated_data
+                        directory_index = updated_index
+                        break
             
             log_to_console(f"Successfully updated {filename}", "SUCCESS")
             
-            # Emit file change event to frontend
-            socketio.emit('file_changed', {
+            # Emit only this file's delta; clients patch the graph they fetched from /data
+            old_nodes, _ = old_index.get(filename, ([], []))
+            emit_to_room('file_changed_patch', {
                 'filename': filename,
                 'type': 'modified',
-                'data': directory_data
-            })
+                'removed_node_ids': [node['id'] for node in old_nodes],
+                'removed_edge_sources': [filename],
+                'added_nodes': new_nodes,
+                'added_edges': new_edges
+            }, workspace_room(get_current_workspace()))
             
         except Exception as e:
             log_to_console(f"Error re-analyzing {filename}: {str(e)}", "ERROR")
 
 def start_file_monitoring(directory):
     """Start monitoring a directory for file changes"""
-    global file_observer, current_monitoring_directory
+    global file_observer, file_handler, current_monitoring_directory
     
     # Stop existing observer if any
     stop_file_monitoring()
     
     try:
         current_monitoring_directory = directory
+        file_handler = CodeFileHandler()
         file_observer = Observer()
-        file_observer.schedule(CodeFileHandler(), directory, recursive=False)
+        file_observer.schedule(file_handler, directory, recursive=False)
         file_observer.start()
         log_to_console(f"Started monitoring directory: {directory}", "SUCCESS")
     except Exception as e:
@@ -144,25 +388,136 @@ def start_file_monitoring(directory):
 
 def stop_file_monitoring():
     """Stop file monitoring"""
-    global file_observer
+    global file_observer, file_handler
     if file_observer and file_observer.is_alive():
         file_observer.stop()
         file_observer.join()
         log_to_console("Stopped file monitoring", "INFO")
+    if file_handler:
+        file_handler.stop()
+        file_handler = None
 
 CONFIG_FILE = "visualizer_config.json"
 WORKSPACES_DIR = "workspaces"
 GLOBAL_PREFERENCES_FILE = "global_preferences.json"
+GLOBAL_PREFERENCES_PATH = os.path.join(WORKSPACES_DIR, GLOBAL_PREFERENCES_FILE)
+PARSE_CACHE_FILE = "parse_cache.json"  # Per-workspace cache of parse results, see analyze_directory
+ANALYSIS_CACHE_FILE = "analysis_cache.json"  # Per-workspace copy of the last finished analysis
+PARALLEL_PARSE_MIN_FILES = 8  # Fewer changed files than this are parsed without a process pool
+
+# Workspace folder scan, reused until the directory changes on disk
+_workspace_folders_cache = (None, {})  # (mtime_ns, {folder: workspace.json data or None})
+
+@functools.lru_cache(maxsize=None)
+def _workspace_folder(workspace_id):
+    """Path of a workspace's folder inside WORKSPACES_DIR"""
+    return os.path.join(WORKSPACES_DIR, workspace_id)
+
+# Parsed JSON files (config, overviews, global preferences), reused until the file changes on disk
+@functools.lru_cache(maxsize=32)
+def _read_json_cached(path, mtime_ns, size):
+    """Parse a JSON file; the stamp arguments key the cache"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def _read_json(path):
+    """Return a parsed JSON file (None if missing), re-reading it only when it changed; do not modify the result"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _read_json_cached(path, st.st_mtime_ns, st.st_size)
+
+# Process umask, read once so temporary files can be given the permissions open() would have used
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _temp_file_beside(path):
+    """Create a uniquely named temporary file next to path and return (fd, tmp_path)"""
+    # Unique per call, so concurrent writers of the same file never share (and clobber) a temporary file
+    return tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.', suffix='.tmp')
+
+def _remove_quietly(path):
+    """Remove a file if it still exists"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _atomic_write(path, payload, durable=True):
+    """Replace a file's contents with bytes so readers see either the old or the new file, never a partial one"""
+    fd, tmp_path = _temp_file_beside(path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            if durable:
+                # Also survive a power loss; skipped for caches, which can be rebuilt
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o666 & ~_UMASK)  # mkstemp creates owner-only files
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+
+def _write_json(path, data):
+    """Atomically write an indented JSON file and drop cached copies"""
+    _atomic_write(path, orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    # A rewrite within the filesystem's timestamp granularity can keep the same stamp
+    _read_json_cached.cache_clear()
+
+def _load_config():
+    """Return the parsed CONFIG_FILE (None if missing), re-reading it only when it changed"""
+    return _read_json(CONFIG_FILE)
+
+def _write_config(config):
+    """Write CONFIG_FILE and drop the cached copy"""
+    _write_json(CONFIG_FILE, config)
+
+def _scan_workspace_folders():
+    """Return {folder: workspace.json data or None} for workspace folders, cached on the directory mtime"""
+    global _workspace_folders_cache
+    try:
+        mtime = os.stat(WORKSPACES_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached_mtime, folders = _workspace_folders_cache
+    if cached_mtime == mtime:
+        return folders
+    
+    folders = {}
+    with os.scandir(WORKSPACES_DIR) as entries:
+        for entry in entries:
+            # DirEntry caches its type from the directory listing, so no extra stat per folder
+            if not (entry.name.startswith('workspace_') and entry.is_dir()):
+                continue
+            item = entry.name
+            workspace_path = entry.path
+            folders[item] = None
+            try:
+                with open(os.path.join(workspace_path, 'workspace.json'), 'rb') as f:
+                    workspace_data = orjson.loads(f.read())
+                folders[item] = workspace_data
+                
+                # Check if explanations.json exists, if not create it
+                explanations_path = os.path.join(workspace_path, 'explanations.json')
+                if not os.path.exists(explanations_path):
+                    _create_explanations_for_workspace(item, workspace_data.get('name', item), workspace_data.get('directory', ''), workspace_path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                log.error("Error loading workspace %s: %s", item, e)
+    _workspace_folders_cache = (mtime, folders)
+    return folders
 
 def load_config():
     global GEMINI_ENABLED, GEMINI_INITIALIZE_ON_STARTUP
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                GEMINI_ENABLED = config.get('gemini_enabled', False)
-                GEMINI_INITIALIZE_ON_STARTUP = config.get('gemini_initialize_on_startup', False)
-                print(f"Loaded config: Gemini enabled={GEMINI_ENABLED}, Auto-initialize={GEMINI_INITIALIZE_ON_STARTUP}")
+        config = _load_config()
+        if config is not None:
+            GEMINI_ENABLED = config.get('gemini_enabled', False)
+            GEMINI_INITIALIZE_ON_STARTUP = config.get('gemini_initialize_on_startup', False)
+            print(f"Loaded config: Gemini enabled={GEMINI_ENABLED}, Auto-initialize={GEMINI_INITIALIZE_ON_STARTUP}")
         else:
             print("No config file found, using default settings")
     except Exception as e:
@@ -172,20 +527,15 @@ def is_first_run():
     """Check if this is the first run of the program"""
     try:
         # Check if workspaces directory exists and has any workspace folders
-        if os.path.exists(WORKSPACES_DIR):
-            workspace_folders = [item for item in os.listdir(WORKSPACES_DIR) 
-                               if os.path.isdir(os.path.join(WORKSPACES_DIR, item)) 
-                               and item.startswith('workspace_')]
-            if workspace_folders:
-                return False
+        if _scan_workspace_folders():
+            return False
         
         # Also check config file as fallback
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                for key in config.keys():
-                    if key.startswith('workspace_') and config[key].get('directory'):
-                        return False
+        config = _load_config()
+        if config is not None:
+            for key in config.keys():
+                if key.startswith('workspace_') and config[key].get('directory'):
+                    return False
         return True
     except:
         return True
@@ -196,73 +546,52 @@ def get_workspaces():
         workspaces = {}
         
         # Load from main config file
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                for key, value in config.items():
-                    if key.startswith('workspace_') and isinstance(value, dict) and 'directory' in value:
-                        workspaces[key] = value
-        
-        # Also check workspace folders and load workspace.json files
-        if os.path.exists(WORKSPACES_DIR):
-            for item in os.listdir(WORKSPACES_DIR):
-                workspace_path = os.path.join(WORKSPACES_DIR, item)
-                if os.path.isdir(workspace_path) and item.startswith('workspace_'):
-                    workspace_json_path = os.path.join(workspace_path, 'workspace.json')
-                    if os.path.exists(workspace_json_path):
-                        try:
-                            with open(workspace_json_path, 'r') as f:
-                                workspace_data = json.load(f)
-                                # Ensure this workspace is in our main config
-                                if item not in workspaces:
-                                    workspaces[item] = {
-                                        'name': workspace_data.get('name', item),
-                                        'directory': workspace_data.get('directory', ''),
-                                        'workspace_folder': workspace_path
-                                    }
-                                
-                                # Check if explanations.json exists, if not create it
-                                explanations_path = os.path.join(workspace_path, 'explanations.json')
-                                if not os.path.exists(explanations_path):
-                                    _create_explanations_for_workspace(item, workspace_data.get('name', item), workspace_data.get('directory', ''), workspace_path)
-                        except Exception as e:
-                            print(f"Error loading workspace {item}: {e}")
-        
-        print(f"Found workspaces: {list(workspaces.keys())}")
+        config = _load_config()
+        if config is not None:
+            for key, value in config.items():
+                if key.startswith('workspace_') and isinstance(value, dict) and 'directory' in value:
+                    workspaces[key] = value
+        
+        # Also check workspace folders and their workspace.json files
+        for item, workspace_data in _scan_workspace_folders().items():
+            # Ensure this workspace is in our main config
+            if workspace_data is not None and item not in workspaces:
+                workspaces[item] = {
+                    'name': workspace_data.get('name', item),
+                    'directory': workspace_data.get('directory', ''),
+                    'workspace_folder': _workspace_folder(item)
+                }
+        
+        log.debug("Found workspaces: %s", list(workspaces))
         return workspaces
     except Exception as e:
-        print(f"Error loading workspaces: {e}")
+        log.error("Error loading workspaces: %s", e)
         return {}
 
 def get_current_workspace():
     """Get the current active workspace"""
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                current = config.get('current_workspace', 'workspace_1')
-                print(f"Current workspace: {current}")
-                return current
-        print("No config file found, using default workspace_1")
+        config = _load_config()
+        if config is not None:
+            current = config.get('current_workspace', 'workspace_1')
+            log.debug("Current workspace: %s", current)
+            return current
+        log.debug("No config file found, using default workspace_1")
         return 'workspace_1'
     except Exception as e:
-        print(f"Error getting current workspace: {e}")
+        log.error("Error getting current workspace: %s", e)
         return 'workspace_1'
 
 def save_config():
     try:
         # Load existing config to preserve workspace data
-        config = {}
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
+        config = dict(_load_config() or {})
         
         # Update only the Gemini settings
         config['gemini_enabled'] = GEMINI_ENABLED
         config['gemini_initialize_on_startup'] = GEMINI_INITIALIZE_ON_STARTUP
         
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
+        _write_config(config)
         print(f"Config saved: Gemini enabled={GEMINI_ENABLED}, Auto-initialize={GEMINI_INITIALIZE_ON_STARTUP}")
     except Exception as e:
         print(f"Error saving config: {e}")
@@ -273,10 +602,10 @@ def create_workspace_structure():
         # Create workspaces directory
         if not os.path.exists(WORKSPACES_DIR):
             os.makedirs(WORKSPACES_DIR)
-            print(f"Created workspaces directory: {WORKSPACES_DIR}")
+            log.debug("Created workspaces directory: %s", WORKSPACES_DIR)
         
         # Create global preferences file
-        global_prefs_path = os.path.join(WORKSPACES_DIR, GLOBAL_PREFERENCES_FILE)
+        global_prefs_path = GLOBAL_PREFERENCES_PATH
         if not os.path.exists(global_prefs_path):
             global_preferences = {
                 "theme": "default",
@@ -292,28 +621,75 @@ def create_workspace_structure():
                 "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
                 "last_modified": time.strftime("%Y-%m-%d %H:%M:%S")
             }
-            with open(global_prefs_path, 'w') as f:
-                json.dump(global_preferences, f, indent=2)
-            print(f"Created global preferences file: {global_prefs_path}")
+            _write_json(global_prefs_path, global_preferences)
+            log.debug("Created global preferences file: %s", global_prefs_path)
         
         # Remove any existing global explanations.json file (legacy)
         global_explanations_path = os.path.join(WORKSPACES_DIR, "explanations.json")
         if os.path.exists(global_explanations_path):
             os.remove(global_explanations_path)
-            print(f"Removed legacy global explanations file: {global_explanations_path}")
+            log.debug("Removed legacy global explanations file: %s", global_explanations_path)
         
         return True
     except Exception as e:
-        print(f"Error creating workspace structure: {e}")
+        log.error("Error creating workspace structure: %s", e)
         return False
 
+# Static part of every workspace's explanations.json; see _make_explanations
+_EXPLANATIONS_TEMPLATE = {
+    "workspace_info": {
+        "description": None,  # Filled in per workspace
+        "files_in_workspace": {
+            "workspace.json": "Main workspace configuration (name, directory path, metadata)",
+            "overview.json": "Project overview, statistics, and summary information", 
+            "recent_changes.json": "Track recent files modified, analysis updates, and user actions",
+            "preferences.json": "Workspace-specific settings and preferences",
+            "explanations.json": "This file - explanations specific to this workspace"
+        }
+    },
+    "project_analysis": {
+        "file_types": {
+            "function": "Python functions found in the codebase",
+            "class": "Python classes found in the codebase",
+            "file": "Python files in the workspace directory"
+        },
+        "visualization_features": {
+            "gemini_analysis": "AI-powered code analysis and insights for this project",
+            "call_graph": "Visual representation of function calls and dependencies",
+            "code_visualization": "Interactive graphs showing code structure",
+            "function_returns": "Track what each function returns",
+            "caller_tracking": "See where functions are called from"
+        }
+    },
+    "workspace_structure": None,  # Filled in per workspace
+    "usage_notes": {
+        "navigation": "Use the carousel to browse through Python files in your project",
+        "interaction": "Click on nodes in the graph to see code details and relationships",
+        "panels": "Side panels show function callers (left) and returns/code (right)",
+        "gemini": "Ask Gemini questions about your code using the input bars"
+    },
+    "created_at": None
+}
+
+def _make_explanations(workspace_id, workspace_name, directory_path):
+    """Build the explanations.json content for a workspace from the shared template"""
+    explanations = copy.deepcopy(_EXPLANATIONS_TEMPLATE)
+    explanations["workspace_info"]["description"] = f"Workspace '{workspace_name}' contains analysis and visualization data for the Python project at {directory_path}"
+    explanations["workspace_structure"] = {
+        "source_directory": directory_path,
+        "workspace_id": workspace_id,
+        "created_for": workspace_name
+    }
+    explanations["created_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    return explanations
+
 def create_workspace_files(workspace_id, workspace_name, directory_path):
     """Create individual JSON files for a workspace"""
     try:
-        workspace_folder = os.path.join(WORKSPACES_DIR, workspace_id)
+        workspace_folder = _workspace_folder(workspace_id)
         if not os.path.exists(workspace_folder):
             os.makedirs(workspace_folder)
-            print(f"Created workspace folder: {workspace_folder}")
+            log.debug("Created workspace folder: %s", workspace_folder)
         
         # Create workspace.json
         workspace_config = {
@@ -325,8 +701,8 @@ def create_workspace_files(workspace_id, workspace_name, directory_path):
             "last_analyzed": None,
             "status": "active"
         }
-        with open(os.path.join(workspace_folder, "workspace.json"), 'w') as f:
-            json.dump(workspace_config, f, indent=2)
+        with open(os.path.join(workspace_folder, "workspace.json"), 'wb') as f:
+            f.write(orjson.dumps(workspace_config, option=orjson.OPT_INDENT_2))
         
         # Create overview.json
         overview = {
@@ -344,8 +720,8 @@ def create_workspace_files(workspace_id, workspace_name, directory_path):
             "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
             "last_updated": time.strftime("%Y-%m-%d %H:%M:%S")
         }
-        with open(os.path.join(workspace_folder, "overview.json"), 'w') as f:
-            json.dump(overview, f, indent=2)
+        with open(os.path.join(workspace_folder, "overview.json"), 'wb') as f:
+            f.write(orjson.dumps(overview, option=orjson.OPT_INDENT_2))
         
         # Create recent_changes.json
         recent_changes = {
@@ -355,8 +731,8 @@ def create_workspace_files(workspace_id, workspace_name, directory_path):
             "gemini_queries": [],
             "last_updated": time.strftime("%Y-%m-%d %H:%M:%S")
         }
-        with open(os.path.join(workspace_folder, "recent_changes.json"), 'w') as f:
-            json.dump(recent_changes, f, indent=2)
+        with open(os.path.join(workspace_folder, "recent_changes.json"), 'wb') as f:
+            f.write(orjson.dumps(recent_changes, option=orjson.OPT_INDENT_2))
         
         # Create preferences.json
         preferences = {
@@ -378,103 +754,29 @@ def create_workspace_files(workspace_id, workspace_name, directory_path):
             "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
             "last_modified": time.strftime("%Y-%m-%d %H:%M:%S")
         }
-        with open(os.path.join(workspace_folder, "preferences.json"), 'w') as f:
-            json.dump(preferences, f, indent=2)
+        with open(os.path.join(workspace_folder, "preferences.json"), 'wb') as f:
+            f.write(orjson.dumps(preferences, option=orjson.OPT_INDENT_2))
         
         # Create explanations.json (workspace-specific)
-        explanations = {
-            "workspace_info": {
-                "description": f"Workspace '{workspace_name}' contains analysis and visualization data for the Python project at {directory_path}",
-                "files_in_workspace": {
-                    "workspace.json": "Main workspace configuration (name, directory path, metadata)",
-                    "overview.json": "Project overview, statistics, and summary information", 
-                    "recent_changes.json": "Track recent files modified, analysis updates, and user actions",
-                    "preferences.json": "Workspace-specific settings and preferences",
-                    "explanations.json": "This file - explanations specific to this workspace"
-                }
-            },
-            "project_analysis": {
-                "file_types": {
-                    "function": "Python functions found in the codebase",
-                    "class": "Python classes found in the codebase",
-                    "file": "Python files in the workspace directory"
-                },
-                "visualization_features": {
-                    "gemini_analysis": "AI-powered code analysis and insights for this project",
-                    "call_graph": "Visual representation of function calls and dependencies",
-                    "code_visualization": "Interactive graphs showing code structure",
-                    "function_returns": "Track what each function returns",
-                    "caller_tracking": "See where functions are called from"
-                }
-            },
-            "workspace_structure": {
-                "source_directory": directory_path,
-                "workspace_id": workspace_id,
-                "created_for": workspace_name
-            },
-            "usage_notes": {
-                "navigation": "Use the carousel to browse through Python files in your project",
-                "interaction": "Click on nodes in the graph to see code details and relationships",
-                "panels": "Side panels show function callers (left) and returns/code (right)",
-                "gemini": "Ask Gemini questions about your code using the input bars"
-            },
-            "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        with open(os.path.join(workspace_folder, "explanations.json"), 'w') as f:
-            json.dump(explanations, f, indent=2)
+        explanations = _make_explanations(workspace_id, workspace_name, directory_path)
+        with open(os.path.join(workspace_folder, "explanations.json"), 'wb') as f:
+            f.write(orjson.dumps(explanations, option=orjson.OPT_INDENT_2))
         
-        print(f"Created all JSON files for workspace: {workspace_id}")
+        log.debug("Created all JSON files for workspace: %s", workspace_id)
         return True
     except Exception as e:
-        print(f"Error creating workspace files: {e}")
+        log.error("Error creating workspace files: %s", e)
         return False
 
 def _create_explanations_for_workspace(workspace_id, workspace_name, directory_path, workspace_folder):
     """Helper function to create explanations.json for a workspace"""
     try:
-        explanations = {
-            "workspace_info": {
-                "description": f"Workspace '{workspace_name}' contains analysis and visualization data for the Python project at {directory_path}",
-                "files_in_workspace": {
-                    "workspace.json": "Main workspace configuration (name, directory path, metadata)",
-                    "overview.json": "Project overview, statistics, and summary information", 
-                    "recent_changes.json": "Track recent files modified, analysis updates, and user actions",
-                    "preferences.json": "Workspace-specific settings and preferences",
-                    "explanations.json": "This file - explanations specific to this workspace"
-                }
-            },
-            "project_analysis": {
-                "file_types": {
-                    "function": "Python functions found in the codebase",
-                    "class": "Python classes found in the codebase",
-                    "file": "Python files in the workspace directory"
-                },
-                "visualization_features": {
-                    "gemini_analysis": "AI-powered code analysis and insights for this project",
-                    "call_graph": "Visual representation of function calls and dependencies",
-                    "code_visualization": "Interactive graphs showing code structure",
-                    "function_returns": "Track what each function returns",
-                    "caller_tracking": "See where functions are called from"
-                }
-            },
-            "workspace_structure": {
-                "source_directory": directory_path,
-                "workspace_id": workspace_id,
-                "created_for": workspace_name
-            },
-            "usage_notes": {
-                "navigation": "Use the carousel to browse through Python files in your project",
-                "interaction": "Click on nodes in the graph to see code details and relationships",
-                "panels": "Side panels show function callers (left) and returns/code (right)",
-                "gemini": "Ask Gemini questions about your code using the input bars"
-            },
-            "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        with open(os.path.join(workspace_folder, "explanations.json"), 'w') as f:
-            json.dump(explanations, f, indent=2)
-        print(f"Created explanations.json for workspace: {workspace_id}")
+        explanations = _make_explanations(workspace_id, workspace_name, directory_path)
+        with open(os.path.join(workspace_folder, "explanations.json"), 'wb') as f:
+            f.write(orjson.dumps(explanations, option=orjson.OPT_INDENT_2))
+        log.debug("Created explanations.json for workspace: %s", workspace_id)
     except Exception as e:
-        print(f"Error creating explanations for workspace {workspace_id}: {e}")
+        log.error("Error creating explanations for workspace %s: %s", workspace_id, e)
 
 def save_workspace_config(workspace_name, directory_path):
     """Save workspace configuration to config file and create workspace structure"""
@@ -484,27 +786,24 @@ def save_workspace_config(workspace_name, directory_path):
             return False
         
         # Load existing config
-        config = {}
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
+        config = dict(_load_config() or {})
         
-        print(f"Current config before adding workspace: {list(config.keys())}")
+        log.debug("Current config before adding workspace: %s", list(config.keys()))
         
         # Find next available workspace ID
         workspace_id = None
         for i in range(1, 100):  # Limit to 99 workspaces
             potential_id = f'workspace_{i}'
-            print(f"Checking potential_id: {potential_id}, exists: {potential_id in config}")
+            log.debug("Checking potential_id: %s, exists: %s", potential_id, potential_id in config)
             if potential_id not in config:
                 workspace_id = potential_id
                 break
         
         if not workspace_id:
-            print("Error: Too many workspaces")
+            log.error("Error: Too many workspaces")
             return False
         
-        print(f"Selected workspace ID: {workspace_id}")
+        log.debug("Selected workspace ID: %s", workspace_id)
         
         # Create workspace files
         if not create_workspace_files(workspace_id, workspace_name, directory_path):
@@ -514,94 +813,295 @@ def save_workspace_config(workspace_name, directory_path):
         config[workspace_id] = {
             'name': workspace_name,
             'directory': directory_path,
-            'workspace_folder': os.path.join(WORKSPACES_DIR, workspace_id)
+            'workspace_folder': _workspace_folder(workspace_id)
         }
         
         # Set as current workspace
         config['current_workspace'] = workspace_id
         
-        print(f"Config after adding workspace: {list(config.keys())}")
+        log.debug("Config after adding workspace: %s", list(config.keys()))
         
         # Save updated config
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
-        print(f"Workspace config saved: {workspace_name} -> {directory_path} (ID: {workspace_id})")
+        _write_config(config)
+        log.debug("Workspace config saved: %s -> %s (ID: %s)", workspace_name, directory_path, workspace_id)
         return True
     except Exception as e:
-        print(f"Error saving workspace config: {e}")
+        log.error("Error saving workspace config: %s", e)
         return False
 
 # Load config on startup
 load_config()
 
-def parse_python_file(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        tree = ast.parse(content)
-        
-        functions = []
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                # Extract return statements
+class _DefinitionCollector:
+    """Collect functions, classes, their return statements and call sites in a single traversal"""
+    
+    def __init__(self, content, filename):
+        # Line endings are normalized to '\n' by _collect_definitions
+        self.lines = content.split('\n')
+        self.filename = filename
+        self.functions = []
+        self.classes = []
+        self.func_line_map = {}  # Definition line -> function name
+        self.calls = []  # (line, called name) for every call site
+    
+    def segment(self, node):
+        """Equivalent of ast.get_source_segment that reuses the pre-split lines"""
+        first, last = node.lineno - 1, node.end_lineno - 1
+        if first == last:
+            return _slice_line(self.lines[first], node.col_offset, node.end_col_offset)
+        return '\n'.join([
+            _slice_line(self.lines[first], node.col_offset, None),
+            *self.lines[first + 1:last],
+            _slice_line(self.lines[last], 0, node.end_col_offset)
+        ])
+    
+    def visit(self, tree):
+        """Walk the tree depth-first with an explicit stack, so deeply nested code can't hit the recursion limit"""
+        # Each entry carries the return lists of every function enclosing the node
+        stack = [(tree, ())]
+        while stack:
+            node, enclosing = stack.pop()
+            node_type = type(node)  # AST node classes are never subclassed, so identity checks are enough
+            
+            if node_type is ast.FunctionDef or node_type is ast.AsyncFunctionDef:
                 returns = []
-                for child in ast.walk(node):
-                    if isinstance(child, ast.Return):
-                        if child.value:
-                            return_code = ast.get_source_segment(content, child)
-                            if return_code:
-                                returns.append(return_code.strip())
-                        else:
-                            returns.append("None")
-                
-                functions.append({
+                self.functions.append({
                     "name": node.name,
-                    "code": ast.get_source_segment(content, node),
+                    "code": self.segment(node),
                     "returns": returns,
-                    "file": os.path.basename(file_path)
+                    "file": self.filename
                 })
-
-        classes = []
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                classes.append({
+                self.func_line_map[node.lineno] = node.name
+                enclosing = enclosing + (returns,)
+            elif node_type is ast.ClassDef:
+                self.classes.append({
                     "name": node.name,
-                    "code": ast.get_source_segment(content, node),
-                    "file": os.path.basename(file_path)
+                    "code": self.segment(node),
+                    "file": self.filename
                 })
-                
-        return functions, classes, content
+            elif node_type is ast.Return:
+                if enclosing:
+                    # A return belongs to every function enclosing it, matching a walk over each function body
+                    return_code = self.segment(node).strip() if node.value else "None"
+                    for returns in enclosing:
+                        returns.append(return_code)
+            elif node_type is ast.Call:
+                f = node.func
+                func_type = type(f)
+                if func_type is ast.Name:  # Direct function call
+                    self.calls.append((node.lineno, f.id))
+                elif func_type is ast.Attribute:  # Method call
+                    self.calls.append((node.lineno, f.attr))
+            
+            # Push children reversed so they are visited in source order, as NodeVisitor would
+            children = list(ast.iter_child_nodes(node))
+            children.reverse()
+            stack.extend((child, enclosing) for child in children)
+
+def _slice_line(line, start, end):
+    """Slice a source line by AST column offsets, which are UTF-8 byte offsets"""
+    if line.isascii():
+        return line[start:end]
+    return line.encode('utf-8')[start:end].decode('utf-8', errors='replace')
+
+def _collect_definitions(file_path):
+    """Parse a Python file and return its AST, line-normalized content and definition collector"""
+    try:
+        with open(file_path, 'rb') as file:
+            source = file.read()
+        
+        # Without a def or class keyword there is nothing to collect, so skip building the AST
+        has_definitions = b'def' in source or b'class' in source
+        tree = None
+        if has_definitions:
+            # Compile straight from bytes so the source is not re-encoded for the parser
+            tree = compile(source, file_path, 'exec', flags=ast.PyCF_ONLY_AST, dont_inherit=True)
+        
+        content = source.decode('utf-8-sig')
+        if '\r' in content:
+            # Match text-mode reads: the collector and the frontend expect '\n' line endings
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        
+        collector = _DefinitionCollector(content, os.path.basename(file_path))
+        if tree is not None:
+            collector.visit(tree)
+        return tree, content, collector
     except (UnicodeDecodeError, TypeError, SyntaxError) as e:
         print(f"Warning: Could not parse file {file_path} due to {type(e).__name__}: {e}. Skipping.")
+        return None, "", None
+
+def parse_python_file_full(file_path):
+    """Parse a Python file and return its AST alongside the extracted functions and classes"""
+    tree, content, collector = _collect_definitions(file_path)
+    if collector is None:
+        return None, [], [], ""
+    return tree, collector.functions, collector.classes, content
+
+@functools.lru_cache(maxsize=256)
+def _parse_cached(file_path, mtime_ns, size):
+    """Parse results for one version of a file; callers must not modify them"""
+    _, functions, classes, content = parse_python_file_full(file_path)
+    return functions, classes, content
+
+def parse_python_file(file_path):
+    # Keyed by mtime and size so an edited file is parsed again while repeated events reuse the result
+    try:
+        st = os.stat(file_path)
+    except OSError:
         return [], [], ""
+    return _parse_cached(file_path, st.st_mtime_ns, st.st_size)
+
+def _parse_for_analysis(file_path):
+    """Parse a file in a worker process and return only what the call-graph pass needs (no AST)"""
+    _, content, collector = _collect_definitions(file_path)
+    if collector is None:
+        return [], [], "", {}, []
+    return collector.functions, collector.classes, content, collector.func_line_map, collector.calls
+
+def scan_python_files(directory):
+    """Return the directory entries of the Python files at the top level of a directory"""
+    # The name check runs first; is_file() then uses the type cached on the directory entry
+    with os.scandir(directory) as entries:
+        return [entry for entry in entries if entry.name.endswith('.py') and entry.is_file()]
+
+def _load_workspace_cache(cache_path):
+    """Load a cache file persisted in a workspace folder ({} if missing or unreadable)"""
+    if not cache_path:
+        return {}
+    try:
+        with open(cache_path, 'rb') as f:
+            data = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
 
-def analyze_directory(directory):
+def _parse_cache_hit(entry, stamp):
+    """Whether a persisted parse cache entry matches the file's stamp and has the shape analyze_directory reads"""
+    # Hand-edited, truncated or older-format entries count as misses and are parsed again
+    try:
+        functions, classes, content, func_lines, calls = entry['result']
+        return (entry['stamp'] == stamp and isinstance(content, str)
+                and all(isinstance(item, dict) and 'name' in item and 'code' in item for item in functions + classes)
+                and all(len(pair) == 2 for pair in func_lines)
+                and all(len(call) == 2 for call in calls))
+    except (KeyError, TypeError, ValueError):
+        return False
+
+def _save_workspace_cache(cache_path, data):
+    """Persist a cache file in a workspace folder for the next analysis"""
+    if not cache_path:
+        return
+    try:
+        _atomic_write(cache_path, orjson.dumps(data), durable=False)
+    except OSError as e:
+        log_to_console(f"Could not save {os.path.basename(cache_path)}: {str(e)}", "WARNING")
+
+_parse_pool = None  # Worker processes for parsing, started on first use and kept for later analyses
+_parse_pool_lock = threading.Lock()
+
+def _get_parse_pool():
+    """Return the shared parse pool, starting it on first use"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _parse_pool
+
+def _discard_parse_pool():
+    """Drop a broken parse pool so the next analysis starts a new one"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+
+def analyze_directory(directory, workspace_folder=None, progress=None):
     log_to_console(f"Starting analysis of directory: {directory}", "INFO")
     
     nodes = []
     edges = []
     all_functions = {}  # Store all functions for call analysis
-    call_graph = {}  # Store who calls what
+    function_nodes = []  # Function nodes waiting for their returns and callers
+    pending_calls = []  # (filename, sorted def lines, def names, calls) resolved after the first pass
     
     try:
-        files = [f for f in os.listdir(directory) if f.endswith('.py')]
-        log_to_console(f"Found {len(files)} Python files to analyze", "INFO")
+        entries = scan_python_files(directory)
+        log_to_console(f"Found {len(entries)} Python files to analyze", "INFO")
         
         # Limit the number of files to prevent performance issues
-        if len(files) > 50:
-            log_to_console(f"Too many files ({len(files)}). Limiting to first 50 for performance.", "WARNING")
-            files = files[:50]
+        if len(entries) > 50:
+            log_to_console(f"Too many files ({len(entries)}). Limiting to first 50 for performance.", "WARNING")
+            entries = entries[:50]
+        files = [entry.name for entry in entries]
     except Exception as e:
         log_to_console(f"Error listing files in directory: {str(e)}", "ERROR")
         return {"nodes": [], "edges": []}
     
-    # First pass: collect all functions and their details
+    # Parse results persisted in the workspace folder, keyed by path and validated by mtime + size
+    parse_cache_path = os.path.join(workspace_folder, PARSE_CACHE_FILE) if workspace_folder else None
+    parse_cache = _load_workspace_cache(parse_cache_path)
+    updated_cache = {}
+    
+    # Only files whose stamp differs from the cached one need parsing
+    stamps = {}
+    to_parse = []
+    for entry in entries:
+        filename = entry.name
+        file_path = os.path.join(directory, filename)
+        try:
+            # DirEntry.stat() is served from the directory listing on Windows and cached per entry elsewhere
+            st = entry.stat()
+            stamps[filename] = [st.st_mtime_ns, st.st_size]
+        except OSError:
+            pass
+        if not (filename in stamps and _parse_cache_hit(parse_cache.get(file_path), stamps[filename])):
+            to_parse.append(filename)
+    log_to_console(f"{len(files) - len(to_parse)} files unchanged since the last analysis", "INFO")
+    
+    # When no file changed and none was added or removed, the last analysis still holds as a whole
+    analysis_cache_path = os.path.join(workspace_folder, ANALYSIS_CACHE_FILE) if workspace_folder else None
+    signature = [[filename, *stamps[filename]] for filename in files if filename in stamps]
+    if not to_parse:
+        cached_analysis = _load_workspace_cache(analysis_cache_path)
+        cached_data = cached_analysis.get('data')
+        if (cached_analysis.get('signature') == signature and isinstance(cached_data, dict)
+                and isinstance(cached_data.get('nodes'), list) and isinstance(cached_data.get('edges'), list)):
+            log_to_console("Directory unchanged, reusing the last analysis", "INFO")
+            if progress:
+                progress(len(files), len(files))
+            return cached_data
+    
+    # First pass: parse changed files and collect all functions and their details
+    # Worker processes only pay off past a handful of files; below that parse in this process
+    futures = {}
+    if len(to_parse) >= PARALLEL_PARSE_MIN_FILES:
+        pool = _get_parse_pool()
+        futures = {filename: pool.submit(_parse_for_analysis, os.path.join(directory, filename)) for filename in to_parse}
+    pending = set(to_parse)
     for i, filename in enumerate(files):
         log_to_console(f"Parsing file {i+1}/{len(files)}: {filename}", "INFO")
+        if progress:
+            progress(i + 1, len(files))
         file_path = os.path.join(directory, filename)
         
         try:
-            functions, classes, content = parse_python_file(file_path)
+            if filename in pending:
+                try:
+                    result = futures[filename].result() if filename in futures else _parse_for_analysis(file_path)
+                except BrokenProcessPool:
+                    # A worker died; start a fresh pool next time and parse this file here
+                    _discard_parse_pool()
+                    result = _parse_for_analysis(file_path)
+                functions, classes, content, func_line_map, calls = result
+                if filename in stamps:
+                    updated_cache[file_path] = {
+                        'stamp': stamps[filename],
+                        'result': [functions, classes, content, list(func_line_map.items()), calls]
+                    }
+            else:
+                updated_cache[file_path] = parse_cache[file_path]
+                functions, classes, content, func_lines, calls = parse_cache[file_path]['result']
+                func_line_map = dict(func_lines)
             
             # Skip files that couldn't be parsed (empty content)
             if not content:
@@ -610,181 +1110,274 @@ def analyze_directory(directory):
             
             for func in functions:
                 func_id = f"{filename}::{func['name']}"
-                all_functions[func_id] = func
-                all_functions[func_id]['file'] = filename
-                all_functions[func_id]['called_by'] = []
+                all_functions[func_id] = {
+                    'name': func['name'],
+                    'returns': func.get('returns', []),
+                    'called_by': {}  # Caller ids in discovery order (dict as an ordered set)
+                }
+            
+            # Build this file's nodes now; returns and called_by are filled in once all calls are resolved
+            nodes.append({"id": filename, "name": filename, "type": "file", "code": content})
+            for func in functions:
+                func_id = f"{filename}::{func['name']}"
+                node = {
+                    "id": func_id, 
+                    "name": func['name'], 
+                    "type": "function", 
+                    "code": func['code'],
+                    "returns": None,
+                    "called_by": None,
+                    "file": filename
+                }
+                nodes.append(node)
+                function_nodes.append(node)
+                edges.append({"source": filename, "target": func_id})
+            for cls in classes:
+                class_id = f"{filename}::{cls['name']}"
+                nodes.append({
+                    "id": class_id, 
+                    "name": cls['name'], 
+                    "type": "class", 
+                    "code": cls['code'],
+                    "file": filename
+                })
+                edges.append({"source": filename, "target": class_id})
+            
+            # Queue the call sites; callers can only be resolved once every file's defs are known
+            if func_line_map and calls:
+                # Sorted definition lines, so the def enclosing a call is found by bisection
+                def_lines = sorted(func_line_map)
+                def_names = [func_line_map[line] for line in def_lines]
+                pending_calls.append((filename, def_lines, def_names, calls))
         except Exception as e:
             log_to_console(f"Error parsing {filename}: {str(e)}", "ERROR")
             continue
+
+    if to_parse or len(updated_cache) != len(parse_cache):
+        _save_workspace_cache(parse_cache_path, updated_cache)
     
-    # Second pass: analyze function calls (optimized)
-    log_to_console(f"Analyzing function calls in {len(files)} files...", "INFO")
-    for i, filename in enumerate(files):
-        log_to_console(f"Analyzing calls in file {i+1}/{len(files)}: {filename}", "INFO")
-        file_path = os.path.join(directory, filename)
+    # Resolve the queued calls against every analyzed function
+    log_to_console(f"Analyzing function calls in {len(pending_calls)} files...", "INFO")
+    funcs_by_name = {}  # Function name -> ids of every analyzed function with that name
+    for func_id, func_data in all_functions.items():
+        funcs_by_name.setdefault(func_data['name'], []).append(func_id)
+    for filename, def_lines, def_names, calls in pending_calls:
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-            tree = ast.parse(content)
-            
-            # Build a mapping of line numbers to function definitions for efficiency
-            func_line_map = {}
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    func_line_map[node.lineno] = node.name
+            # Caller id per bisect position, checked once per def instead of once per call;
+            # position 0 means the call comes before any def in the file
+            callers = [None]
+            for name in def_names:
+                caller_id = f"{filename}::{name}"
+                callers.append(caller_id if caller_id in all_functions else None)
             
-            # Find all function calls in this file
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Call):
-                    func_name = None
-                    if hasattr(node.func, 'id'):  # Direct function call
-                        func_name = node.func.id
-                    elif hasattr(node.func, 'attr'):  # Method call
-                        func_name = node.func.attr
-                    
-                    if func_name:
-                        # Check if this function exists in our analysis
-                        for func_id, func_data in all_functions.items():
-                            if func_data['name'] == func_name:
-                                # Find which function contains this call using line numbers
-                                current_func = None
-                                call_line = node.lineno
-                                
-                                # Find the function that contains this call
-                                best_match_line = 0
-                                for func_line, func_name_def in func_line_map.items():
-                                    if func_line <= call_line and func_line > best_match_line:
-                                        current_func = func_name_def
-                                        best_match_line = func_line
-                                
-                                if current_func:
-                                    caller_id = f"{filename}::{current_func}"
-                                    if caller_id in all_functions:
-                                        if caller_id not in all_functions[func_id]['called_by']:
-                                            all_functions[func_id]['called_by'].append(caller_id)
+            # Find every call's enclosing def (the last def at or before the call line) in one C-level map
+            positions = map(functools.partial(bisect.bisect_right, def_lines), [line for line, _ in calls])
+            for (_, func_name), position in zip(calls, positions):
+                caller_id = callers[position]
+                if caller_id is None:
+                    continue
+                
+                # Record the caller on every analyzed function with this name
+                for func_id in funcs_by_name.get(func_name, ()):
+                    all_functions[func_id]['called_by'][caller_id] = None
         except Exception as e:
             log_to_console(f"Error analyzing calls in {filename}: {str(e)}", "WARNING")
             continue
     
-    # Build nodes and edges
-    log_to_console(f"Building graph nodes and edges...", "INFO")
-    for i, filename in enumerate(files):
-        log_to_console(f"Building nodes for file {i+1}/{len(files)}: {filename}", "INFO")
-        file_id = filename
-        file_path = os.path.join(directory, filename)
-        functions, classes, content = parse_python_file(file_path)
+    # Fill in the function nodes (a later def with the same name wins, as in all_functions)
+    for node in function_nodes:
+        func_data = all_functions[node['id']]
+        node['returns'] = func_data['returns']
+        node['called_by'] = list(func_data['called_by'])
+
+    data = {"nodes": nodes, "edges": edges}
+    if len(signature) == len(files):
+        _save_workspace_cache(analysis_cache_path, {'signature': signature, 'data': data})
+    return data
+
+def submit_analysis(directory, workspace_folder=None, run_gemini=False):
+    """Queue a directory for analysis on the background worker and return its job id"""
+    global analysis_worker_started
+    job_id = uuid.uuid4().hex
+    with analysis_jobs_lock:
+        analysis_jobs[job_id] = {'status': 'queued', 'directory': directory, 'processed': 0, 'total': 0}
+        
+        # Forget the oldest finished jobs so the table doesn't grow forever
+        finished = [jid for jid, job in analysis_jobs.items() if job['status'] in ('complete', 'error')]
+        for jid in finished[:max(0, len(finished) - MAX_FINISHED_ANALYSIS_JOBS)]:
+            del analysis_jobs[jid]
+        
+        if not analysis_worker_started:
+            analysis_worker_started = True
+            threading.Thread(target=analysis_worker, daemon=True).start()
+    analysis_queue.put({'job_id': job_id, 'directory': directory, 'workspace_folder': workspace_folder, 'run_gemini': run_gemini})
+    return job_id
+
+def _update_analysis_job(job_id, **fields):
+    with analysis_jobs_lock:
+        analysis_jobs[job_id].update(fields)
+
+def analysis_worker():
+    """Run queued analysis jobs one at a time, publishing results and progress"""
+    # A real thread rather than a socketio background task: the parse pool and queue waits block
+    while True:
+        job = analysis_queue.get()
+        job_id = job['job_id']
+        directory = job['directory']
+        _update_analysis_job(job_id, status='running')
+        last_emit = [0.0]
+        
+        def progress(processed, total):
+            _update_analysis_job(job_id, processed=processed, total=total)
+            now = time.monotonic()
+            if processed == total or now - last_emit[0] >= ANALYSIS_PROGRESS_INTERVAL:
+                last_emit[0] = now
+                socketio.emit('analysis_progress', {'job_id': job_id, 'processed': processed, 'total': total})
         
-        if not content:
-            continue
-        
-        nodes.append({"id": file_id, "name": filename, "type": "file", "code": content})
-        
-        for func in functions:
-            func_id = f"{filename}::{func['name']}"
-            func_data = all_functions.get(func_id, func)
-            nodes.append({
-                "id": func_id, 
-                "name": func['name'], 
-                "type": "function", 
-                "code": func['code'],
-                "returns": func_data.get('returns', []),
-                "called_by": func_data.get('called_by', []),
-                "file": filename
-            })
-            edges.append({"source": file_id, "target": func_id})
+        try:
+            # Stop watching the old workspace so its updates can't land in the new graph
+            stop_file_monitoring()
+            data = analyze_directory(directory, job['workspace_folder'], progress=progress)
+            set_directory_data(data)
+            log_to_console(f"Analysis complete. Found {len(data['nodes'])} nodes and {len(data['edges'])} edges.", "INFO")
+            start_file_monitoring(directory)
             
-        for cls in classes:
-            class_id = f"{filename}::{cls['name']}"
-            nodes.append({
-                "id": class_id, 
-                "name": cls['name'], 
-                "type": "class", 
-                "code": cls['code'],
-                "file": filename
-            })
-            edges.append({"source": file_id, "target": class_id})
-
-    return {"nodes": nodes, "edges": edges}
+            # Gemini summarizes the published graph, so it can only start once this workspace's is in place
+            if job['run_gemini']:
+                threading.Thread(target=perform_gemini_analysis, daemon=True).start()
+                log.debug("Gemini analysis started in background thread.")
+            _update_analysis_job(job_id, status='complete', nodes=len(data['nodes']), edges=len(data['edges']))
+            socketio.emit('analysis_complete', {'job_id': job_id, 'nodes': len(data['nodes']), 'edges': len(data['edges'])})
+        except Exception as e:
+            log_to_console(f"Error analyzing {directory}: {str(e)}", "ERROR")
+            _update_analysis_job(job_id, status='error', error=str(e))
+            socketio.emit('analysis_complete', {'job_id': job_id, 'error': str(e)})
+
+# Gemini command blocks and the fields inside them, compiled once rather than per response
+_CREATE_BLOCK_RE = re.compile(r"```file_create\s*\n([\s\S]*?)```")
+_MODIFY_BLOCK_RE = re.compile(r"```file_modify\s*\n([\s\S]*?)```")
+_PATH_RE = re.compile(r"^path:\s*(.+)\s*$", re.M)
+_CONTENT_RE = re.compile(r"^content:\s*\n(.*)\Z", re.M | re.S)
+_FIND_RE = re.compile(r"^find:\s*\n(.*?)\n^replace:\s*\n", re.M | re.S)
+_REPLACE_RE = re.compile(r"^replace:\s*\n(.*)\Z", re.M | re.S)
 
 def parse_gemini_commands(gemini_response_text):
     commands = []
     
-    # Regex for file_create blocks
-    create_pattern = re.compile(r'```file_create\s*\npath:\s*(.*?)\ncontent:\s*|\n(.*?)\n```', re.DOTALL)
-    for match in create_pattern.finditer(gemini_response_text):
-        path = match.group(1).strip()
-        content = match.group(2).strip()
+    # Plain chat replies have no command blocks; one substring scan skips both regex passes
+    if '```file_' not in gemini_response_text:
+        return commands
+    
+    # file_create blocks: path and content
+    for block in _CREATE_BLOCK_RE.findall(gemini_response_text):
+        path_match = _PATH_RE.search(block)
+        content_match = _CONTENT_RE.search(block)
+        if not path_match:
+            continue
+        path = path_match.group(1).strip()
+        content = content_match.group(1).strip() if content_match else ''
         commands.append({'type': 'create_file', 'path': path, 'content': content})
         
-    # Regex for file_modify blocks
-    modify_pattern = re.compile(r'```file_modify\s*\npath:\s*(.*?)\nfind:\s*|\n(.*?)\nreplace:\s*|\n(.*?)\n```', re.DOTALL)
-    for match in modify_pattern.finditer(gemini_response_text):
-        path = match.group(1).strip()
-        find_str = match.group(2).strip()
-        replace_str = match.group(3).strip()
+    # file_modify blocks: path, find and replace
+    for block in _MODIFY_BLOCK_RE.findall(gemini_response_text):
+        path_match = _PATH_RE.search(block)
+        find_match = _FIND_RE.search(block)
+        replace_match = _REPLACE_RE.search(block)
+        if not (path_match and find_match and replace_match):
+            continue
+        path = path_match.group(1).strip()
+        find_str = find_match.group(1).strip()
+        replace_str = replace_match.group(1).strip()
         commands.append({'type': 'modify_file', 'path': path, 'find': find_str, 'replace': replace_str})
         
     return commands
 
 def execute_commands(commands, base_directory):
     results = []
+    # Final content per file, written once after every command has been applied in order
+    pending_writes = {}
+    original_contents = {}
+    success_slots = {}  # File -> positions in results of its success messages, confirmed once it is written
     for cmd in commands:
         try:
             full_path = os.path.join(base_directory, cmd['path'])
             
             if cmd['type'] == 'create_file':
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                with open(full_path, 'w', encoding='utf-8') as f:
-                    f.write(cmd['content'])
-                log_to_console(f"Created file: {cmd['path']}", "SUCCESS")
+                pending_writes[full_path] = cmd['content']
+                success_slots.setdefault(full_path, []).append(len(results))
                 results.append(f"Created file: {cmd['path']}")
                 
             elif cmd['type'] == 'modify_file':
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                if full_path in pending_writes:
+                    content = pending_writes[full_path]
+                else:
+                    with open(full_path, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                    original_contents[full_path] = content
                 
-                if cmd['find'] not in content:
+                # Locate the first occurrence once and splice the replacement in
+                find_str = cmd['find']
+                idx = content.find(find_str)
+                if idx < 0:
                     log_to_console(f"Modification failed for {cmd['path']}: 'find' string not found.", "WARNING")
                     results.append(f"Modification failed for {cmd['path']}: 'find' string not found.")
                     continue
                     
-                new_content = content.replace(cmd['find'], cmd['replace'], 1) # Replace only first occurrence
-                
-                with open(full_path, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
-                log_to_console(f"Modified file: {cmd['path']}", "SUCCESS")
+                pending_writes[full_path] = content[:idx] + cmd['replace'] + content[idx + len(find_str):]
+                success_slots.setdefault(full_path, []).append(len(results))
                 results.append(f"Modified file: {cmd['path']}")
                 
         except Exception as e:
             log_to_console(f"Error executing command {cmd['type']} for {cmd.get('path', 'unknown')}: {str(e)}", "ERROR")
             results.append(f"Error executing command {cmd['type']} for {cmd.get('path', 'unknown')}: {str(e)}")
+    
+    made_dirs = set()
+    for full_path, content in pending_writes.items():
+        slots = success_slots[full_path]
+        try:
+            # Modifications that left the file as it was need no write but still succeeded
+            if original_contents.get(full_path) != content:
+                directory = os.path.dirname(full_path)
+                if directory not in made_dirs:
+                    os.makedirs(directory, exist_ok=True)
+                    made_dirs.add(directory)
+                with open(full_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+        except Exception as e:
+            # The file's commands didn't take effect: report the error in place of their success messages
+            log_to_console(f"Error writing {full_path}: {str(e)}", "ERROR")
+            results[slots[0]] = f"Error writing {full_path}: {str(e)}"
+            for slot in slots[1:]:
+                results[slot] = None
+            continue
+        for slot in slots:
+            log_to_console(results[slot], "SUCCESS")
             
-    return results
+    return [result for result in results if result is not None]
 
 def perform_gemini_analysis():
     global initial_analysis, analysis_complete
     
     # Check for cached overview first
     current_workspace = get_current_workspace()
-    workspace_folder = os.path.join(WORKSPACES_DIR, current_workspace)
+    workspace_folder = _workspace_folder(current_workspace)
     overview_path = os.path.join(workspace_folder, 'overview.json')
     
     try:
-        if os.path.exists(overview_path):
-            with open(overview_path, 'r', encoding='utf-8') as f:
-                overview_data = json.load(f)
-                cached_summary = overview_data.get('gemini_summary')
-                last_analysis = overview_data.get('last_analysis')
-                
-                # Only skip analysis if we have a cached summary AND last_analysis is not null
-                if cached_summary and last_analysis is not None:
-                    log_to_console("Loading cached Gemini analysis...", "INFO")
-                    initial_analysis = cached_summary
-                    analysis_complete = True
-                    log_to_console("Cached analysis loaded successfully", "SUCCESS")
-                    return
-                else:
-                    log_to_console("No valid cached analysis found - will run new analysis", "INFO")
+        overview_data = _read_json(overview_path)
+        if overview_data is not None:
+            cached_summary = overview_data.get('gemini_summary')
+            last_analysis = overview_data.get('last_analysis')
+            
+            # Only skip analysis if we have a cached summary AND last_analysis is not null
+            if cached_summary and last_analysis is not None:
+                log_to_console("Loading cached Gemini analysis...", "INFO")
+                initial_analysis = cached_summary
+                analysis_complete = True
+                log_to_console("Cached analysis loaded successfully", "SUCCESS")
+                return
+            else:
+                log_to_console("No valid cached analysis found - will run new analysis", "INFO")
     except Exception as e:
         log_to_console(f"Error loading cached analysis: {str(e)}", "ERROR")
     
@@ -793,32 +1386,26 @@ def perform_gemini_analysis():
         log_to_console("Initializing Gemini analysis...", "INFO")
         log_to_console("Connecting to Gemini API...", "INFO")
         
-        all_code = ""
+        analysis_prompt = "Analyze this codebase and provide a high-level overview. Focus on:\n1. Main purpose and functionality\n2. Key components and their relationships\n3. Architecture patterns used\n4. Potential areas of interest or complexity\n\nDo not change anything, just analyze and explain."
+        
+        # Collect the prompt pieces and join once; node code is already a decoded str
+        parts = [analysis_prompt, "\n\n"]
         file_count = 0
-        for node in directory_data['nodes']:
+        for node in get_directory_data_snapshot()['nodes']:
             if node['type'] == 'file':
-                try:
-                    # Ensure the code is properly encoded and clean
-                    code_content = node.get('code', '')
-                    if code_content:
-                        # Remove any problematic characters and ensure UTF-8
-                        clean_code = code_content.encode('utf-8', errors='replace').decode('utf-8')
-                        all_code += f"\n\n--- {node['name']} ---\n{clean_code}"
-                        file_count += 1
-                except Exception as e:
-                    log_to_console(f"Warning: Skipping file {node.get('name', 'unknown')} due to encoding issue: {str(e)}", "WARNING")
-                    continue
+                code_content = node.get('code', '')
+                if code_content:
+                    parts.append(f"\n\n--- {node['name']} ---\n{code_content}")
+                    file_count += 1
         
         log_to_console(f"Processing {file_count} Python files...", "INFO")
         
-        analysis_prompt = "Analyze this codebase and provide a high-level overview. Focus on:\n1. Main purpose and functionality\n2. Key components and their relationships\n3. Architecture patterns used\n4. Potential areas of interest or complexity\n\nDo not change anything, just analyze and explain."
-        
         log_to_console("Sending code to Gemini for analysis...", "INFO")
         
         command = ["C:\\Users\\paytonmiller\\AppData\\Roaming\\npm\\gemini.cmd", "-p", "-"]
         result = subprocess.run(
             command,
-            input=analysis_prompt + "\n\n" + all_code,
+            input=''.join(parts),
             capture_output=True,
             text=True,
             encoding='utf-8',
@@ -847,29 +1434,35 @@ def save_gemini_overview(analysis_text):
     """Save Gemini analysis to the current workspace's overview.json"""
     try:
         current_workspace = get_current_workspace()
-        workspace_folder = os.path.join(WORKSPACES_DIR, current_workspace)
+        workspace_folder = _workspace_folder(current_workspace)
         overview_path = os.path.join(workspace_folder, 'overview.json')
         
         # Ensure the workspace folder exists
         os.makedirs(workspace_folder, exist_ok=True)
         
-        # Load existing overview or create new one
-        overview_data = {}
-        if os.path.exists(overview_path):
-            with open(overview_path, 'r', encoding='utf-8') as f:
-                overview_data = json.load(f)
+        # Load existing overview or create new one (copied, the cached dict is shared)
+        overview_data = dict(_read_json(overview_path) or {})
         
         # Update with Gemini analysis and project stats
-        file_count = len([n for n in directory_data['nodes'] if n['type'] == 'file'])
-        function_count = len([n for n in directory_data['nodes'] if n['type'] == 'function'])
-        class_count = len([n for n in directory_data['nodes'] if n['type'] == 'class'])
+        # Count everything in one pass over a single snapshot
+        file_count = function_count = class_count = line_count = 0
+        for n in get_directory_data_snapshot()['nodes']:
+            node_type = n['type']
+            if node_type == 'file':
+                file_count += 1
+                code = n.get('code', '')
+                line_count += code.count('\n') + (1 if code else 0)  # An empty file has no lines
+            elif node_type == 'function':
+                function_count += 1
+            elif node_type == 'class':
+                class_count += 1
         
         overview_data.update({
             'project_stats': {
                 'total_files': file_count,
                 'total_functions': function_count,
                 'total_classes': class_count,
-                'total_lines': sum(len(n.get('code', '').split('\n')) for n in directory_data['nodes'] if n['type'] == 'file')
+                'total_lines': line_count
             },
             'last_analysis': time.strftime("%Y-%m-%d %H:%M:%S"),
             'gemini_summary': analysis_text,
@@ -877,8 +1470,7 @@ def save_gemini_overview(analysis_text):
         })
         
         # Save updated overview
-        with open(overview_path, 'w', encoding='utf-8') as f:
-            json.dump(overview_data, f, indent=2, ensure_ascii=False)
+        _write_json(overview_path, overview_data)
         
         log_to_console(f"Overview saved to {overview_path}", "SUCCESS")
         
@@ -886,7 +1478,6 @@ def save_gemini_overview(analysis_text):
         log_to_console(f"Error saving overview: {str(e)}", "ERROR")
 
 def select_directory_and_analyze():
-    global directory_data
     print("=== select_directory_and_analyze() called ===")
     root = tk.Tk()
     root.withdraw()
@@ -896,9 +1487,10 @@ def select_directory_and_analyze():
         print("No directory selected. Exiting.")
         return False
         
-    directory_data = analyze_directory(directory_path)
+    data = analyze_directory(directory_path)
+    set_directory_data(data)
     print(f"Analyzed directory: {directory_path}")
-    print(f"Found {len(directory_data['nodes'])} nodes and {len(directory_data['edges'])} edges.")
+    print(f"Found {len(data['nodes'])} nodes and {len(data['edges'])} edges.")
     
     # Start Gemini analysis in a separate thread (only if enabled and auto-initialize is on)
     if GEMINI_ENABLED and GEMINI_INITIALIZE_ON_STARTUP:
@@ -913,10 +1505,9 @@ def select_directory_and_analyze():
 @app.route('/')
 def index():
     if is_first_run():
-        return render_template_string(open('first_run.html', 'r', encoding='utf-8').read())
+        return html_page('first_run.html')
     else:
         # Load current workspace data if not already loaded
-        global directory_data
         if not directory_data:
             try:
                 current_workspace = get_current_workspace()
@@ -930,29 +1521,39 @@ def index():
                     # Check if directory exists
                     if not os.path.exists(workspace_dir):
                         log_to_console(f"Workspace directory does not exist: {workspace_dir}", "ERROR")
-                        directory_data = {"nodes": [], "edges": []}
+                        set_directory_data({"nodes": [], "edges": []})
                     else:
-                        directory_data = analyze_directory(workspace_dir)
-                        log_to_console(f"Analysis complete. Found {len(directory_data['nodes'])} nodes and {len(directory_data['edges'])} edges.", "INFO")
+                        data = analyze_directory(workspace_dir, _workspace_folder(current_workspace))
+                        set_directory_data(data)
+                        log_to_console(f"Analysis complete. Found {len(data['nodes'])} nodes and {len(data['edges'])} edges.", "INFO")
                         
                         # Start file monitoring
                         start_file_monitoring(workspace_dir)
                 else:
                     log_to_console(f"No valid workspace found. Current: {current_workspace}, Available: {list(workspaces.keys())}", "WARNING")
-                    directory_data = {"nodes": [], "edges": []}
+                    set_directory_data({"nodes": [], "edges": []})
             except Exception as e:
                 log_to_console(f"Error loading workspace: {str(e)}", "ERROR")
-                directory_data = {"nodes": [], "edges": []}
+                set_directory_data({"nodes": [], "edges": []})
         
-        return render_template_string(open('index.html', 'r', encoding='utf-8').read())
+        return html_page('index.html')
 
 @app.route('/styles.css')
 def styles():
-    return send_from_directory('.', 'styles.css')
+    return send_from_directory('.', 'styles.css', max_age=STATIC_MAX_AGE)
 
 @app.route('/data')
 def data():
-    return jsonify(directory_data)
+    return json_response(get_directory_data_snapshot())
+
+@app.route('/analysis/status/<job_id>')
+def analysis_status(job_id):
+    with analysis_jobs_lock:
+        job = analysis_jobs.get(job_id)
+        job = dict(job) if job else None
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown analysis job'}), 404
+    return jsonify({'success': True, 'job_id': job_id, **job})
 
 @app.route('/initial-analysis')
 def get_initial_analysis():
@@ -961,7 +1562,7 @@ def get_initial_analysis():
             'analysis': 'Gemini analysis is disabled.',
             'complete': True
         })
-    return jsonify({
+    return json_response({
         'analysis': initial_analysis,
         'complete': analysis_complete
     })
@@ -976,22 +1577,20 @@ def get_settings():
     }
     
     try:
-        global_prefs_path = os.path.join(WORKSPACES_DIR, GLOBAL_PREFERENCES_FILE)
-        if os.path.exists(global_prefs_path):
-            with open(global_prefs_path, 'r') as f:
-                global_prefs = json.load(f)
-                theme_settings = {
-                    'theme': global_prefs.get('theme', 'default'),
-                    'custom_primary': global_prefs.get('custom_primary', '#00ff00'),
-                    'custom_secondary': global_prefs.get('custom_secondary', '#121212'),
-                    'auto_save_gemini': global_prefs.get('auto_save_gemini', False)
-                }
-                # Also load gemini settings from global prefs
-                global GEMINI_ENABLED, GEMINI_INITIALIZE_ON_STARTUP
-                GEMINI_ENABLED = global_prefs.get('gemini_enabled', False)
-                GEMINI_INITIALIZE_ON_STARTUP = global_prefs.get('gemini_initialize_on_startup', False)
+        global_prefs = _read_json(GLOBAL_PREFERENCES_PATH)
+        if global_prefs is not None:
+            theme_settings = {
+                'theme': global_prefs.get('theme', 'default'),
+                'custom_primary': global_prefs.get('custom_primary', '#00ff00'),
+                'custom_secondary': global_prefs.get('custom_secondary', '#121212'),
+                'auto_save_gemini': global_prefs.get('auto_save_gemini', False)
+            }
+            # Also load gemini settings from global prefs
+            global GEMINI_ENABLED, GEMINI_INITIALIZE_ON_STARTUP
+            GEMINI_ENABLED = global_prefs.get('gemini_enabled', False)
+            GEMINI_INITIALIZE_ON_STARTUP = global_prefs.get('gemini_initialize_on_startup', False)
     except Exception as e:
-        print(f"Error loading global preferences: {e}")
+        log.error("Error loading global preferences: %s", e)
     
     return jsonify({
         'gemini_enabled': GEMINI_ENABLED,
@@ -1003,7 +1602,7 @@ def get_settings():
 @app.route('/settings', methods=['POST'])
 def update_settings():
     global GEMINI_ENABLED, GEMINI_INITIALIZE_ON_STARTUP
-    data = request.json
+    data = get_json()
     GEMINI_ENABLED = data.get('gemini_enabled', False)
     GEMINI_INITIALIZE_ON_STARTUP = data.get('gemini_initialize_on_startup', False)
     
@@ -1013,13 +1612,10 @@ def update_settings():
         if not os.path.exists(WORKSPACES_DIR):
             os.makedirs(WORKSPACES_DIR)
         
-        global_prefs_path = os.path.join(WORKSPACES_DIR, GLOBAL_PREFERENCES_FILE)
+        global_prefs_path = GLOBAL_PREFERENCES_PATH
         
-        # Load existing global preferences
-        global_prefs = {}
-        if os.path.exists(global_prefs_path):
-            with open(global_prefs_path, 'r') as f:
-                global_prefs = json.load(f)
+        # Load existing global preferences (copied, the cached dict is shared)
+        global_prefs = dict(_read_json(global_prefs_path) or {})
         
         # Update all settings
         global_prefs.update({
@@ -1033,25 +1629,20 @@ def update_settings():
         })
         
         # Save updated global preferences
-        with open(global_prefs_path, 'w') as f:
-            json.dump(global_prefs, f, indent=2)
+        _write_json(global_prefs_path, global_prefs)
         
-        print(f"Global settings saved: Gemini enabled={GEMINI_ENABLED}, Theme={global_prefs['theme']}")
+        log.debug("Global settings saved: Gemini enabled=%s, Theme=%s", GEMINI_ENABLED, global_prefs['theme'])
         
         # Also update the old config file for backward compatibility
-        config = {}
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
+        config = dict(_load_config() or {})
         
         config['gemini_enabled'] = GEMINI_ENABLED
         config['gemini_initialize_on_startup'] = GEMINI_INITIALIZE_ON_STARTUP
         
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
+        _write_config(config)
             
     except Exception as e:
-        print(f"Error saving settings: {e}")
+        log.error("Error saving settings: %s", e)
         return jsonify({'success': False, 'error': str(e)})
     
     return jsonify({'success': True})
@@ -1072,7 +1663,7 @@ def initialize_gemini():
 
 @app.route('/first-run')
 def first_run_page():
-    return render_template_string(open('first_run.html', 'r', encoding='utf-8').read())
+    return html_page('first_run.html')
 
 @app.route('/check-first-run')
 def check_first_run():
@@ -1082,7 +1673,7 @@ def check_first_run():
 def get_workspaces_endpoint():
     workspaces = get_workspaces()
     current_workspace = get_current_workspace()
-    print(f"API /workspaces called - Found {len(workspaces)} workspaces, current: {current_workspace}")
+    log.debug("API /workspaces called - Found %d workspaces, current: %s", len(workspaces), current_workspace)
     return jsonify({
         'workspaces': workspaces,
         'current_workspace': current_workspace
@@ -1091,7 +1682,7 @@ def get_workspaces_endpoint():
 @app.route('/switch-workspace', methods=['POST'])
 def switch_workspace():
     try:
-        data = request.json
+        data = get_json()
         workspace_id = data.get('workspace_id')
         
         if not workspace_id:
@@ -1103,27 +1694,18 @@ def switch_workspace():
         
         # Update current workspace in config
         try:
-            config = {}
-            if os.path.exists(CONFIG_FILE):
-                with open(CONFIG_FILE, 'r') as f:
-                    config = json.load(f)
+            config = dict(_load_config() or {})
             
             config['current_workspace'] = workspace_id
             
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(config, f, indent=2)
+            _write_config(config)
             
-            # Analyze the new workspace directory
-            global directory_data
+            # Analyze the new workspace directory in the background; the worker also starts file monitoring
             workspace_dir = workspaces[workspace_id]['directory']
-            directory_data = analyze_directory(workspace_dir)
-            print(f"Switched to workspace: {workspace_id} -> {workspace_dir}")
-            print(f"Found {len(directory_data['nodes'])} nodes and {len(directory_data['edges'])} edges.")
+            job_id = submit_analysis(workspace_dir, _workspace_folder(workspace_id))
+            log.debug("Switched to workspace: %s -> %s", workspace_id, workspace_dir)
             
-            # Start file monitoring for the new workspace
-            start_file_monitoring(workspace_dir)
-            
-            return jsonify({'success': True, 'message': f'Switched to {workspaces[workspace_id]["name"]}'})
+            return jsonify({'success': True, 'message': f'Switched to {workspaces[workspace_id]["name"]}', 'job_id': job_id}), 202
             
         except Exception as e:
             return jsonify({'success': False, 'error': f'Failed to switch workspace: {str(e)}'})
@@ -1134,7 +1716,7 @@ def switch_workspace():
 @app.route('/remove-workspace', methods=['POST'])
 def remove_workspace():
     try:
-        data = request.json
+        data = get_json()
         workspace_id = data.get('workspace_id')
         
         if not workspace_id:
@@ -1150,118 +1732,114 @@ def remove_workspace():
         workspace_name = workspaces[workspace_id]['name']
         
         # Remove workspace folder and its contents
-        workspace_folder = os.path.join(WORKSPACES_DIR, workspace_id)
+        workspace_folder = _workspace_folder(workspace_id)
         if os.path.exists(workspace_folder):
             shutil.rmtree(workspace_folder)
-            print(f"Removed workspace folder: {workspace_folder}")
+            log.debug("Removed workspace folder: %s", workspace_folder)
         
         # Load current config and remove workspace entry
-        config = {}
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
+        config = dict(_load_config() or {})
         
         if workspace_id in config:
             del config[workspace_id]
         
         # If this was the current workspace, switch to workspace_1
+        job_id = None
         current_workspace = config.get('current_workspace')
         if current_workspace == workspace_id:
             config['current_workspace'] = 'workspace_1'
             
             # Reload data for workspace_1
-            global directory_data
             remaining_workspaces = get_workspaces()
             if 'workspace_1' in remaining_workspaces:
                 workspace_dir = remaining_workspaces['workspace_1']['directory']
-                directory_data = analyze_directory(workspace_dir)
-                print(f"Switched to default workspace: workspace_1 -> {workspace_dir}")
+                job_id = submit_analysis(workspace_dir, _workspace_folder('workspace_1'))
+                log.debug("Switched to default workspace: workspace_1 -> %s", workspace_dir)
         
         # Save updated config
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
+        _write_config(config)
         
-        print(f"Removed workspace: {workspace_id} ({workspace_name})")
-        return jsonify({'success': True, 'message': f'Removed workspace "{workspace_name}"'})
+        log.debug("Removed workspace: %s (%s)", workspace_id, workspace_name)
+        return jsonify({'success': True, 'message': f'Removed workspace "{workspace_name}"', 'job_id': job_id}), 202 if job_id else 200
         
     except Exception as e:
-        print(f"Error removing workspace: {e}")
+        log.error("Error removing workspace: %s", e)
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/validate-directory', methods=['POST'])
 def validate_directory():
     try:
-        print("Validate directory endpoint called")
-        data = request.json
-        print(f"Received data: {data}")
+        log.debug("Validate directory endpoint called")
+        data = get_json()
+        log.debug("Received data: %s", data)
         directory_path = data.get('directory_path', '')
-        print(f"Directory path: {directory_path}")
+        log.debug("Directory path: %s", directory_path)
         
         if not directory_path:
-            print("No directory path provided")
+            log.debug("No directory path provided")
             return jsonify({'success': False, 'error': 'No directory path provided'})
         
         # Check if directory exists
         if not os.path.exists(directory_path):
-            print(f"Directory does not exist: {directory_path}")
+            log.debug("Directory does not exist: %s", directory_path)
             return jsonify({'success': False, 'error': 'Directory does not exist'})
         
         # Check if it's actually a directory
         if not os.path.isdir(directory_path):
-            print(f"Path is not a directory: {directory_path}")
+            log.debug("Path is not a directory: %s", directory_path)
             return jsonify({'success': False, 'error': 'Path is not a directory'})
         
-        # Check if it contains Python files
-        python_files = [f for f in os.listdir(directory_path) if f.endswith('.py')]
-        print(f"Found Python files: {python_files}")
-        if not python_files:
-            print("No Python files found")
+        # Count Python files the way analysis lists them, without materializing the directory listing
+        with os.scandir(directory_path) as entries:
+            python_file_count = sum(1 for entry in entries if entry.name.endswith('.py') and entry.is_file())
+        if not python_file_count:
+            log.debug("No Python files found")
             return jsonify({'success': False, 'error': 'No Python files found in directory'})
         
-        print(f"Validation successful, found {len(python_files)} Python files")
-        return jsonify({'success': True, 'message': f'Found {len(python_files)} Python files'})
+        log.debug("Validation successful, found %d Python files", python_file_count)
+        return jsonify({'success': True, 'message': f'Found {python_file_count} Python files'})
         
     except Exception as e:
-        print(f"Error in validate_directory: {e}")
+        log.error("Error in validate_directory: %s", e)
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/validate-parent-directory', methods=['POST'])
 def validate_parent_directory():
     """Validate a parent directory for creating new projects"""
     try:
-        data = request.json
+        data = get_json()
         directory_path = data.get('directory_path')
         
         if not directory_path:
             return jsonify({'success': False, 'error': 'No directory path provided'})
         
-        print(f"Validating parent directory: {directory_path}")
+        log.debug("Validating parent directory: %s", directory_path)
         
         # Check if directory exists
         if not os.path.exists(directory_path):
-            print("Parent directory does not exist")
+            log.debug("Parent directory does not exist")
             return jsonify({'success': False, 'error': 'Directory does not exist'})
         
         # Check if it's actually a directory
         if not os.path.isdir(directory_path):
-            print("Path is not a directory")
+            log.debug("Path is not a directory")
             return jsonify({'success': False, 'error': 'Path is not a directory'})
         
         # Check if we have write permissions
         if not os.access(directory_path, os.W_OK):
-            print("No write permissions for directory")
+            log.debug("No write permissions for directory")
             return jsonify({'success': False, 'error': 'No write permissions for this directory'})
         
-        print(f"Parent directory validation successful")
+        log.debug("Parent directory validation successful")
         return jsonify({'success': True, 'message': 'Directory is valid for creating new projects'})
         
     except Exception as e:
-        print(f"Error in validate_parent_directory: {e}")
+        log.error("Error in validate_parent_directory: %s", e)
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/save-workspace', methods=['POST'])
 def save_workspace():
-    data = request.json
+    data = get_json()
     workspace_name = data.get('workspace_name')
     directory_path = data.get('directory_path')
     
@@ -1269,63 +1847,17 @@ def save_workspace():
         return jsonify({'success': False, 'error': 'Missing workspace name or directory path'})
     
     if save_workspace_config(workspace_name, directory_path):
-        # Analyze the directory and start the main app
-        global directory_data
-        directory_data = analyze_directory(directory_path)
-        print(f"Analyzed directory: {directory_path}")
-        print(f"Found {len(directory_data['nodes'])} nodes and {len(directory_data['edges'])} edges.")
-        
-        # Start file monitoring
-        start_file_monitoring(directory_path)
-        
-        # Start Gemini analysis if enabled and auto-initialize is on
-        if GEMINI_ENABLED and GEMINI_INITIALIZE_ON_STARTUP:
-            analysis_thread = threading.Thread(target=perform_gemini_analysis, daemon=True)
-            analysis_thread.start()
-            print("Gemini analysis started in background thread.")
-        
-        return jsonify({'success': True, 'message': 'Workspace saved and analysis started'})
+        # Analyze the directory in the background; the worker also starts file monitoring,
+        # then Gemini analysis if enabled and auto-initialize is on
+        job_id = submit_analysis(directory_path, _workspace_folder(get_current_workspace()),
+                                 run_gemini=GEMINI_ENABLED and GEMINI_INITIALIZE_ON_STARTUP)
+        
+        return jsonify({'success': True, 'message': 'Workspace saved and analysis started', 'job_id': job_id}), 202
     else:
         return jsonify({'success': False, 'error': 'Failed to save workspace configuration'})
 
-@app.route('/create-new-project', methods=['POST'])
-def create_new_project():
-    """Create a new project with a blank main.py file"""
-    try:
-        data = request.json
-        parent_directory = data.get('parent_directory')
-        project_name = data.get('project_name')
-        
-        if not parent_directory or not project_name:
-            return jsonify({'success': False, 'error': 'Missing parent directory or project name'})
-        
-        # Validate parent directory exists
-        if not os.path.exists(parent_directory) or not os.path.isdir(parent_directory):
-            return jsonify({'success': False, 'error': 'Parent directory does not exist or is not a directory'})
-        
-        project_path = os.path.join(parent_directory, project_name)
-        
-        # Check if project directory already exists and is not empty
-        if os.path.exists(project_path) and os.listdir(project_path):
-            return jsonify({'success': False, 'error': f'Directory "{project_name}" already exists and is not empty'})
-        
-        # Create the project directory if it doesn't exist
-        if not os.path.exists(project_path):
-            os.makedirs(project_path)
-            log_to_console(f"Created project directory: {project_path}", "INFO")
-        
-        # Create an empty main.py file
-        main_py_path = os.path.join(project_path, 'main.py')
-        main_py_content = '' # Empty content
-        
-        with open(main_py_path, 'w', encoding='utf-8') as f:
-            f.write(main_py_content)
-        
-        log_to_console(f"Created main.py file in {project_name}", "INFO")
-        
-        # Create a basic README.md file
-        readme_path = os.path.join(project_path, 'README.md')
-        readme_content = f'''# {project_name}
+# README.md written into new projects; {project_name} is filled in per project
+NEW_PROJECT_README = '''# {project_name}
 
 A new Python project created with Python Code Visualizer.
 
@@ -1345,27 +1877,52 @@ python main.py
 
 Add your Python modules and packages to this directory and start coding!
 '''
+
+@app.route('/create-new-project', methods=['POST'])
+def create_new_project():
+    """Create a new project with a blank main.py file"""
+    try:
+        data = get_json()
+        parent_directory = data.get('parent_directory')
+        project_name = data.get('project_name')
         
-        with open(readme_path, 'w', encoding='utf-8') as f:
-            f.write(readme_content)
+        if not parent_directory or not project_name:
+            return jsonify({'success': False, 'error': 'Missing parent directory or project name'})
+        
+        # Validate parent directory exists (isdir is False for missing paths too)
+        if not os.path.isdir(parent_directory):
+            return jsonify({'success': False, 'error': 'Parent directory does not exist or is not a directory'})
+        
+        project_path = os.path.join(parent_directory, project_name)
+        
+        # One scandir tells whether the project directory exists and whether it is empty
+        try:
+            with os.scandir(project_path) as entries:
+                if next(entries, None) is not None:
+                    return jsonify({'success': False, 'error': f'Directory "{project_name}" already exists and is not empty'})
+        except FileNotFoundError:
+            # Create the project directory since it doesn't exist
+            os.makedirs(project_path, exist_ok=True)
+            log_to_console(f"Created project directory: {project_path}", "INFO")
         
-        log_to_console(f"Created README.md file in {project_name}", "INFO")
+        # Create an empty main.py file and a basic README.md file
+        for filename, content in (('main.py', ''), ('README.md', NEW_PROJECT_README.format(project_name=project_name))):
+            with open(os.path.join(project_path, filename), 'w', encoding='utf-8') as f:
+                f.write(content)
+            log_to_console(f"Created {filename} file in {project_name}", "INFO")
         
         # Save the new project as a workspace
         if save_workspace_config(project_name, project_path):
-            # Analyze the new directory
-            global directory_data
-            directory_data = analyze_directory(project_path)
-            log_to_console(f"Analyzed new project: {project_path}", "INFO")
-            
-            # Start file monitoring
-            start_file_monitoring(project_path)
+            # Analyze the new directory in the background; the worker also starts file monitoring
+            job_id = submit_analysis(project_path, _workspace_folder(get_current_workspace()))
+            log_to_console(f"Queued analysis of new project: {project_path}", "INFO")
             
             return jsonify({
                 'success': True, 
                 'message': f'New project "{project_name}" created successfully with main.py',
-                'project_path': project_path
-            })
+                'project_path': project_path,
+                'job_id': job_id
+            }), 202
         else:
             return jsonify({'success': False, 'error': 'Failed to save workspace configuration'})
             
@@ -1375,51 +1932,44 @@ Add your Python modules and packages to this directory and start coding!
 
 @app.route('/ask-gemini', methods=['POST'])
 def ask_gemini():
-    data = request.json
+    data = get_json()
     user_prompt = data.get('user_prompt')
     full_project_context = data.get('full_project_context', False)
 
     if not user_prompt:
         return jsonify({'error': 'Missing prompt'}), 400
 
+    # Build the prompt from a list of pieces joined once, rather than growing one string
     if full_project_context:
-        # Get all code from directory_data
-        all_code = ""
-        for node in directory_data.get('nodes', []):
-            if node.get('type') == 'file':
-                all_code += f"\n\n--- {node.get('name', 'unknown')} ---\n{node.get('code', '')}"
-        
-        full_prompt = f"""Here is an entire Python project:
-{all_code}
-
-Based on the entire project, please respond to the following request: {user_prompt}"""
+        prompt_parts = ["Here is an entire Python project:\n", get_project_context()]
+        prompt_parts.append(f"\n\nBased on the entire project, please respond to the following request: {user_prompt}")
 
     else:
         script_code = data.get('script_code')
         target_code = data.get('target_code')
         
-        full_prompt = f"""Here is a Python script:
+        prompt_parts = [f"""Here is a Python script:
 
 ```python
 {script_code}
 ```
 
-"""
+"""]
         if target_code:
-            full_prompt += f"""Within that script, focus on this specific function/class:
+            prompt_parts.append(f"""Within that script, focus on this specific function/class:
 
 ```python
 {target_code}
 ```
 
-"""
-        full_prompt += f"Now, please respond to the following request: {user_prompt}"
+""")
+        prompt_parts.append(f"Now, please respond to the following request: {user_prompt}")
 
     try:
         command = ["C:\\Users\\paytonmiller\\AppData\\Roaming\\npm\\gemini.cmd", "-p", "-"]
         result = subprocess.run(
             command,
-            input=full_prompt,
+            input=''.join(prompt_parts),
             capture_output=True,
             text=True,
             check=True,
@@ -1447,7 +1997,7 @@ Based on the entire project, please respond to the following request: {user_prom
             final_response += "\n\n--- Actions Performed ---" + "\n".join(action_results)
             
         log_to_console(f"Final response sent to frontend: {final_response}", "DEBUG")
-        return jsonify({'response': final_response})
+        return json_response({'response': final_response})
 
     except FileNotFoundError:
         return jsonify({'error': 'The "gemini" command was not found.'}), 500
@@ -1464,18 +2014,16 @@ Based on the entire project, please respond to the following request: {user_prom
 def get_global_preferences():
     """Get global preferences that persist across workspaces"""
     try:
-        global_prefs_path = os.path.join(WORKSPACES_DIR, GLOBAL_PREFERENCES_FILE)
-        if os.path.exists(global_prefs_path):
-            with open(global_prefs_path, 'r') as f:
-                global_prefs = json.load(f)
-                return jsonify({
-                    'theme': global_prefs.get('theme', 'default'),
-                    'custom_primary': global_prefs.get('custom_primary', '#00ff00'),
-                    'custom_secondary': global_prefs.get('custom_secondary', '#121212'),
-                    'auto_save_gemini': global_prefs.get('auto_save_gemini', False)
-                })
+        global_prefs = _read_json(GLOBAL_PREFERENCES_PATH)
+        if global_prefs is not None:
+            return jsonify({
+                'theme': global_prefs.get('theme', 'default'),
+                'custom_primary': global_prefs.get('custom_primary', '#00ff00'),
+                'custom_secondary': global_prefs.get('custom_secondary', '#121212'),
+                'auto_save_gemini': global_prefs.get('auto_save_gemini', False)
+            })
     except Exception as e:
-        print(f"Error loading global preferences: {e}")
+        log.error("Error loading global preferences: %s", e)
     
     # Return defaults if file doesn't exist or error occurred
     return jsonify({
@@ -1487,16 +2035,25 @@ def get_global_preferences():
 
 @app.route('/console-output')
 def get_console_output():
-    """Get console log entries"""
-    return jsonify({
-        'logs': list(console_logs)
+    """Get console log entries, only those after ?since=<seq> when given"""
+    since = request.args.get('since', 0, type=int)
+    with console_logs_lock:
+        # Sequence numbers are consecutive, so the first wanted entry is found by offset
+        first_seq = console_logs[0][0] if console_logs else 0
+        entries = list(itertools.islice(console_logs, max(0, since - first_seq + 1), None))
+        last_seq = console_log_seq
+    return json_response({
+        'logs': [{"seq": seq, "timestamp": timestamp, "level": level, "message": message}
+                 for seq, timestamp, level, message in entries],
+        'last_seq': last_seq,
+        'boot_id': CONSOLE_BOOT_ID
     })
 
 @app.route('/save-code', methods=['POST'])
 def save_code():
     """Save edited code to a file"""
     try:
-        data = request.json
+        data = get_json()
         file_path = data.get('file_path')
         content = data.get('content')
         modal_type = data.get('modal_type', 'main')
@@ -1509,24 +2066,37 @@ def save_code():
         if not current_workspace:
             return jsonify({'success': False, 'error': 'No active workspace'})
         
-        # Normalize and validate the file path
-        abs_file_path = os.path.abspath(file_path)
-        abs_workspace_path = os.path.abspath(current_workspace)
+        # Normalize and validate the file path; the separator keeps sibling folders like "proj2" out of "proj"
+        abs_file_path = os.path.realpath(file_path)
         
-        if not abs_file_path.startswith(abs_workspace_path):
+        if not abs_file_path.startswith(_workspace_prefix(current_workspace)):
             return jsonify({'success': False, 'error': 'File path is outside the workspace directory'})
         
         # Check if file exists
         if not os.path.exists(abs_file_path):
             return jsonify({'success': False, 'error': 'File does not exist'})
         
-        # Create a backup of the original file
+        # Keep the original as the backup through a hard link, so it is never copied and never missing
         backup_path = abs_file_path + '.backup'
-        shutil.copy2(abs_file_path, backup_path)
+        try:
+            os.remove(backup_path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(abs_file_path, backup_path)
+        except OSError:
+            shutil.copy2(abs_file_path, backup_path)  # Filesystems without hard links
         
-        # Write the new content to the file
-        with open(abs_file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # Write the new content beside the original and swap it in with one atomic rename
+        fd, tmp_path = _temp_file_beside(abs_file_path)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            shutil.copymode(abs_file_path, tmp_path)
+            os.replace(tmp_path, abs_file_path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
         
         log_to_console(f"Code saved to {os.path.basename(abs_file_path)} from {modal_type} modal", "INFO")
         
@@ -1546,6 +2116,11 @@ def save_code():
         log_to_console(f"Error saving code: {str(e)}", "ERROR")
         return jsonify({'success': False, 'error': str(e)})
 
+@functools.lru_cache(maxsize=16)
+def _workspace_prefix(workspace_path):
+    """Resolved workspace path with a trailing separator, for prefix checks on files inside it"""
+    return os.path.join(os.path.realpath(workspace_path), '')
+
 def get_current_workspace_path():
     """Get the path of the currently active workspace"""
     # Try to get from the current monitoring directory
@@ -1561,19 +2136,18 @@ def get_current_workspace_path():
                 if workspace['name'] == workspace_name:
                     return workspace['directory_path']
     except Exception as e:
-        print(f"Error getting current workspace path: {e}")
+        log.error("Error getting current workspace path: %s", e)
     
     return None
 
 def load_global_preferences():
     """Load global preferences from file"""
     try:
-        global_prefs_path = os.path.join(WORKSPACES_DIR, GLOBAL_PREFERENCES_FILE)
-        if os.path.exists(global_prefs_path):
-            with open(global_prefs_path, 'r') as f:
-                return json.load(f)
+        global_prefs = _read_json(GLOBAL_PREFERENCES_PATH)
+        if global_prefs is not None:
+            return dict(global_prefs)
     except Exception as e:
-        print(f"Error loading global preferences: {e}")
+        log.error("Error loading global preferences: %s", e)
     
     return {}
 